@@ -2,21 +2,30 @@
 # -*- coding: utf-8 -*-
 
 import tkinter as tk
-from tkinter import messagebox, filedialog
+from tkinter import messagebox
 import tkinter.font as tkfont
 
+from typing import TYPE_CHECKING
+
 import chess
-import chess.engine
+import chess.polyglot
+
+if TYPE_CHECKING:
+    import asyncio
+    import queue
 
-import asyncio
-import threading
-import queue
+    import chess.engine
+
+# chess.engine, asyncio, threading, queue and tkinter.filedialog are imported on first use,
+# keeping the engine/UCI import graph off the startup path.
 import os
 import shutil
 import sys
 
 
 class ChessAnalyzerApp:
+    _zobrist = chess.polyglot.ZobristHasher(chess.polyglot.POLYGLOT_RANDOM_ARRAY)
+
     def __init__(self, master: tk.Tk):
         self.master = master
         master.title("Chess Analyzer and Board")
@@ -66,9 +75,12 @@ class ChessAnalyzerApp:
             },
         }
         self.theme = "dark"
+        self._cache_palette()
 
         # --- Chess state and GUI ---
         self.board = chess.Board()
+        # Polyglot Zobrist hash of self.board, updated incrementally by _push_move.
+        self._board_hash = chess.polyglot.zobrist_hash(self.board)
         self.board_flipped = False
         self.square_size = 60
         self.selected_square = None
@@ -77,28 +89,53 @@ class ChessAnalyzerApp:
         # Choose a Unicode-capable font (Linux often lacks Arial).
         self.piece_font_family = self._detect_piece_font_family()
 
-        # --- Engine and threading ---
+        # (glyph, fill) per piece, keyed by (color << 3) | piece_type.
+        self._glyphs = {
+            (color << 3) | piece_type: (
+                chess.Piece(piece_type, color).unicode_symbol(),
+                "#101010" if color == chess.BLACK else "#f0f0f0",
+            )
+            for color in chess.COLORS
+            for piece_type in chess.PIECE_TYPES
+        }
+
+        # --- Engine and threading (started on first connect) ---
         self.engine = None
         self.engine_thread = None
-        self.request_queue: "queue.Queue[tuple[str, object]]" = queue.Queue()
-        self.result_queue: "queue.Queue[tuple[str, object]]" = queue.Queue()
+        # Set on window close; from then on the worker stops calling into Tk.
+        self._closing = False
+        self._loop: "asyncio.AbstractEventLoop | None" = None
+        self.result_queue: "queue.Queue[tuple[str, object]] | None" = None
+        # Serializes access to the single engine session across scheduled coroutines.
+        self._engine_lock: "asyncio.Lock | None" = None
+        # Running analysis handle (engine thread), so a board change can stop the search.
+        self._analysis: "chess.engine.AnalysisResult | None" = None
+        # Zobrist key of the position the GUI is waiting on results for; None when idle.
+        self._analysis_key: "int | None" = None
+        # Finished analyses keyed by Zobrist hash: (best move UCI, eval text, eval palette key, depth).
+        self._tt: "dict[int, tuple[str, str, str, int]]" = {}
+        self.tt_min_depth = 18
+        # Sent once per connection so the engine's own hash table persists across searches.
+        self.engine_hash_mb = 256
+        self.engine_threads = max(1, (os.cpu_count() or 2) - 1)
 
         self._create_widgets()
         self._apply_theme()
         self._draw_board()
-        self._start_engine_thread()
-        self._check_result_queue()
 
         self.master.protocol("WM_DELETE_WINDOW", self._on_closing)
 
     # ----------------------------
     # Theme helpers
     # ----------------------------
-    def _palette(self) -> dict:
-        return self.themes[self.theme]
+    def _cache_palette(self):
+        """Resolve the active palette once per theme change instead of on every draw."""
+        p = self._p = self.themes[self.theme]
+        self._board_colors = (p["board_light"], p["board_dark"])
+        self._coord_fg = p["coord_fg"]
 
     def _set_status(self, text: str, kind: str = "info"):
-        p = self._palette()
+        p = self._p
         color = {
             "info": p["accent"],
             "success": p["success"],
@@ -110,6 +147,7 @@ class ChessAnalyzerApp:
 
     def _toggle_theme(self):
         self.theme = "light" if self.theme == "dark" else "dark"
+        self._cache_palette()
         self._apply_theme()
         self._draw_board()
 
@@ -118,78 +156,47 @@ class ChessAnalyzerApp:
         self._set_status(current, "info")
 
     def _apply_theme(self):
-        p = self._palette()
+        p = self._p
         self.master.configure(bg=p["bg"])
 
-        # Recursively apply to all widgets
-        def apply(widget: tk.Widget):
-            wclass = widget.winfo_class()
+        for frame in self._frame_widgets:
+            frame.configure(bg=p["bg"])
 
-            try:
-                if wclass in ("Frame", "TFrame"):
-                    widget.configure(bg=p["bg"])
-                elif wclass in ("Labelframe", "LabelFrame"):
-                    widget.configure(bg=p["panel"], fg=p["text"], highlightthickness=0)
-                elif wclass in ("Label", "TLabel"):
-                    widget.configure(bg=p["panel"], fg=p["text"])
-                elif wclass in ("Entry", "TEntry"):
-                    widget.configure(
-                        bg=p["entry_bg"],
-                        fg=p["text"],
-                        insertbackground=p["text"],
-                        relief="flat",
-                        highlightthickness=1,
-                        highlightbackground=p["panel_alt"],
-                        highlightcolor=p["accent"],
-                    )
-                elif wclass in ("Button", "TButton"):
-                    widget.configure(
-                        bg=p["button_bg"],
-                        fg=p["button_fg"],
-                        activebackground=p["button_active_bg"],
-                        activeforeground=p["button_fg"],
-                        relief="flat",
-                        highlightthickness=0,
-                        bd=0,
-                    )
-                elif wclass in ("Canvas",):
-                    widget.configure(bg=p["canvas_bg"], highlightthickness=0)
-                elif wclass in ("Checkbutton", "Radiobutton"):
-                    widget.configure(bg=p["panel"], fg=p["text"], activebackground=p["panel"])
-                else:
-                    # Fall back gently
-                    if "bg" in widget.configure():
-                        widget.configure(bg=p["panel"])
-                    if "fg" in widget.configure():
-                        widget.configure(fg=p["text"])
-            except Exception:
-                pass
+        for lf in self._panel_widgets:
+            lf.configure(bg=p["panel"], fg=p["text"], highlightthickness=0)
 
-            for child in widget.winfo_children():
-                apply(child)
+        for label in self._label_widgets:
+            label.configure(bg=p["panel"], fg=p["text"])
 
-        apply(self.master)
-
-        # Tweak specific container backgrounds
-        self.controls_frame.configure(bg=p["bg"])
-        self.main_frame.configure(bg=p["bg"])
-        self.board_frame.configure(bg=p["bg"])
+        for entry in self._entry_widgets:
+            entry.configure(
+                bg=p["entry_bg"],
+                fg=p["text"],
+                insertbackground=p["text"],
+                relief="flat",
+                highlightthickness=1,
+                highlightbackground=p["panel_alt"],
+                highlightcolor=p["accent"],
+            )
 
-        # LabelFrames should be panels
-        for lf in (self.sf_frame, self.fen_frame, self.analysis_frame):
-            lf.configure(bg=p["panel"], fg=p["text"])
+        for button in self._button_widgets:
+            button.configure(
+                bg=p["button_bg"],
+                fg=p["button_fg"],
+                activebackground=p["button_active_bg"],
+                activeforeground=p["button_fg"],
+                relief="flat",
+                highlightthickness=0,
+                bd=0,
+            )
 
-        self.canvas.configure(bg=p["canvas_bg"])
+        self.canvas.configure(bg=p["canvas_bg"], highlightthickness=0)
 
         # Semantic labels
         if self.engine is None:
-            self.sf_status_label.configure(text="Status: Not connected", fg=p["error"], bg=p["panel"])
+            self.sf_status_label.configure(text="Status: Not connected", fg=p["error"])
         else:
-            self.sf_status_label.configure(text="Status: Connected!", fg=p["success"], bg=p["panel"])
-
-        self.player_label.configure(bg=p["panel"], fg=p["text"])
-        self.best_move_label.configure(bg=p["panel"], fg=p["text"])
-        self.evaluation_label.configure(bg=p["panel"], fg=p["text"])
+            self.sf_status_label.configure(text="Status: Connected!", fg=p["success"])
 
     # ----------------------------
     # UI helpers / platform glue
@@ -239,6 +246,13 @@ class ChessAnalyzerApp:
     # Widget creation
     # ----------------------------
     def _create_widgets(self):
+        # Widgets grouped by theme style, so _apply_theme can restyle them without walking the tree.
+        self._frame_widgets: "list[tk.Frame]" = []
+        self._panel_widgets: "list[tk.LabelFrame]" = []
+        self._label_widgets: "list[tk.Label]" = []
+        self._entry_widgets: "list[tk.Entry]" = []
+        self._button_widgets: "list[tk.Button]" = []
+
         self.main_frame = tk.Frame(self.master)
         self.main_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
 
@@ -248,15 +262,18 @@ class ChessAnalyzerApp:
         self.controls_frame = tk.Frame(self.main_frame, width=400)
         self.controls_frame.pack(side=tk.RIGHT, fill=tk.Y, padx=(10, 0))
         self.controls_frame.pack_propagate(False)
+        self._frame_widgets += [self.main_frame, self.board_frame, self.controls_frame]
 
         self.canvas = tk.Canvas(self.board_frame, width=self.square_size * 8 + 40, height=self.square_size * 8 + 40)
         self.canvas.pack(anchor="center", pady=20)
         self.canvas.bind("<Button-1>", self._on_square_click)
+        self._create_board_items(30)
 
         self.sf_frame = tk.LabelFrame(self.controls_frame, text="Stockfish Engine Setup", padx=10, pady=10)
         self.sf_frame.pack(pady=10, padx=10, fill="x")
 
-        tk.Label(self.sf_frame, text="Executable (path or command):").grid(row=0, column=0, sticky="w", pady=2)
+        path_label = tk.Label(self.sf_frame, text="Executable (path or command):")
+        path_label.grid(row=0, column=0, sticky="w", pady=2)
 
         self.stockfish_path_var = tk.StringVar(self.master)
         self.stockfish_path_entry = tk.Entry(self.sf_frame, textvariable=self.stockfish_path_var, width=30)
@@ -272,6 +289,9 @@ class ChessAnalyzerApp:
         self.sf_status_label.grid(row=3, column=0, columnspan=2, pady=2)
 
         self.sf_frame.grid_columnconfigure(0, weight=1)
+        self._label_widgets += [path_label, self.sf_status_label]
+        self._entry_widgets.append(self.stockfish_path_entry)
+        self._button_widgets += [self.browse_button, self.connect_button]
 
         self.fen_frame = tk.LabelFrame(self.controls_frame, text="Board State (FEN)", padx=10, pady=10)
         self.fen_frame.pack(pady=10, padx=10, fill="x")
@@ -288,6 +308,8 @@ class ChessAnalyzerApp:
 
         self.theme_button = tk.Button(self.fen_frame, text="Toggle Dark / Light Theme", command=self._toggle_theme)
         self.theme_button.pack(fill="x")
+        self._entry_widgets.append(self.fen_entry)
+        self._button_widgets += [reset_button, flip_button, self.theme_button]
 
         self.analysis_frame = tk.LabelFrame(self.controls_frame, text="Analysis", padx=10, pady=10)
         self.analysis_frame.pack(pady=10, padx=10, fill="x")
@@ -297,15 +319,18 @@ class ChessAnalyzerApp:
         )
         self.analyze_button.pack(fill="x", pady=5)
 
-        tk.Label(self.analysis_frame, text="Current Player:").pack(anchor="w")
+        player_caption = tk.Label(self.analysis_frame, text="Current Player:")
+        player_caption.pack(anchor="w")
         self.player_label = tk.Label(self.analysis_frame, text="", font=("TkDefaultFont", 10, "bold"))
         self.player_label.pack(anchor="w", pady=(0, 5))
 
-        tk.Label(self.analysis_frame, text="Best Move:").pack(anchor="w")
+        best_move_caption = tk.Label(self.analysis_frame, text="Best Move:")
+        best_move_caption.pack(anchor="w")
         self.best_move_label = tk.Label(self.analysis_frame, text="", font=("TkDefaultFont", 12, "bold"))
         self.best_move_label.pack(anchor="w", pady=(0, 5))
 
-        tk.Label(self.analysis_frame, text="Evaluation:").pack(anchor="w")
+        evaluation_caption = tk.Label(self.analysis_frame, text="Evaluation:")
+        evaluation_caption.pack(anchor="w")
         self.evaluation_label = tk.Label(self.analysis_frame, text="", font=("TkDefaultFont", 12, "bold"))
         self.evaluation_label.pack(anchor="w", pady=(0, 5))
 
@@ -314,6 +339,18 @@ class ChessAnalyzerApp:
         )
         self.status_label.pack(pady=10, fill="x")
 
+        self._panel_widgets += [self.sf_frame, self.fen_frame, self.analysis_frame]
+        self._label_widgets += [
+            player_caption,
+            self.player_label,
+            best_move_caption,
+            self.best_move_label,
+            evaluation_caption,
+            self.evaluation_label,
+            self.status_label,
+        ]
+        self._button_widgets.append(self.analyze_button)
+
         detected = self._find_stockfish_in_path()
         if detected:
             self.stockfish_path_var.set(detected)
@@ -324,80 +361,128 @@ class ChessAnalyzerApp:
     # ----------------------------
     # Board rendering
     # ----------------------------
-    def _draw_board(self):
-        self.canvas.delete("all")
-        p = self._palette()
+    def _create_board_items(self, offset: int):
+        """Create the persistent canvas items (squares and coordinate labels) once."""
+        self._rebuild_pixel_tables(offset)
 
-        coord_offset = 30
+        # The 64 squares are a single pre-rendered image, redrawn by _render_board_image on theme change.
+        self._board_img = None
+        self.canvas.create_image(offset, offset, anchor="nw", tags="boardimg")
+
+        # Per row/column: left rank, right rank, top file, bottom file.
+        self._coord_items = []
         for i in range(8):
-            for j in range(8):
-                x1, y1 = j * self.square_size + coord_offset, i * self.square_size + coord_offset
-                x2, y2 = x1 + self.square_size, y1 + self.square_size
-                color = p["board_light"] if (i + j) % 2 == 0 else p["board_dark"]
-                self.canvas.create_rectangle(x1, y1, x2, y2, fill=color, tags="square", outline="")
-
-        self._draw_pieces(coord_offset)
-        self._draw_coordinates(coord_offset)
+            center = i * self.square_size + offset + self.square_size / 2
+            far = 8 * self.square_size + offset + offset / 2
+            for x, y in ((offset / 2, center), (far, center), (center, offset / 2), (center, far)):
+                self._coord_items.append(self.canvas.create_text(x, y, font=("TkDefaultFont", 10), tags="coordinate"))
+        self._draw_coordinates()
+
+        self._piece_items_by_square = {}
+        # Piece-type and white bitboards as of the last _draw_pieces; all empty before the first draw.
+        self._prev_bitboards = (chess.BB_EMPTY,) * 7
+
+        # Selection frame plus one destination dot per chess square, shown/hidden on demand.
+        self._hl_rect = self.canvas.create_rectangle(
+            0, 0, 0, 0, width=3, state="hidden", tags=("highlight", "highlight_square")
+        )
+        self._hl_ovals = [
+            self.canvas.create_oval(0, 0, 0, 0, outline="", state="hidden", tags=("highlight", "highlight_dot"))
+            for _ in chess.SQUARES
+        ]
+        self._layout_highlights()
+
+    def _draw_board(self):
+        accent = self._p["accent"]
+
+        self._render_board_image(*self._board_colors)
+
+        # Tag-scoped configures: one Tcl call per color group instead of one per item.
+        self.canvas.itemconfigure("coordinate", fill=self._coord_fg)
+        self.canvas.itemconfigure(self._hl_rect, outline=accent)
+        self.canvas.itemconfigure("highlight_dot", fill=accent)
+
+        self._draw_pieces()
         self._update_player_label()
 
-    def _draw_pieces(self, offset: int):
-        self.canvas.delete("piece")
-        for square in chess.SQUARES:
-            piece = self.board.piece_at(square)
-            if not piece:
+    def _render_board_image(self, light: str, dark: str):
+        """Paint the checkerboard as one 8x8-pixel image scaled up to the board size."""
+        rows = (" ".join(light if (i + j) % 2 == 0 else dark for j in range(8)) for i in range(8))
+        cells = tk.PhotoImage(master=self.canvas, width=8, height=8)
+        cells.put(" ".join("{" + row + "}" for row in rows))
+
+        # Keep a reference on self: Tk drops images that Python garbage-collects.
+        self._board_img = cells.zoom(self.square_size, self.square_size)
+        self.canvas.itemconfigure("boardimg", image=self._board_img)
+
+    def _draw_pieces(self):
+        """Sync piece items with the board, touching only squares whose piece changed."""
+        board = self.board
+        bitboards = (
+            board.pawns,
+            board.knights,
+            board.bishops,
+            board.rooks,
+            board.queens,
+            board.kings,
+            board.occupied_co[chess.WHITE],
+        )
+
+        # Set bits are exactly the squares whose occupant (type or color) changed.
+        changed = chess.BB_EMPTY
+        for prev, current in zip(self._prev_bitboards, bitboards):
+            changed |= prev ^ current
+
+        for square in chess.scan_reversed(changed):
+            piece = board.piece_at(square)
+            item = self._piece_items_by_square.get(square)
+            if piece is None:
+                self.canvas.delete(item)
+                del self._piece_items_by_square[square]
                 continue
 
-            x, y = self._square_to_pixel(square, offset)
-            piece_symbol = piece.unicode_symbol()
-            fill_color = "#101010" if piece.color == chess.BLACK else "#f0f0f0"
-
-            self.canvas.create_text(
-                x,
-                y,
-                text=piece_symbol,
-                font=(self.piece_font_family, self.square_size // 2, "bold"),
-                tags="piece",
-                fill=fill_color,
+            piece_symbol, fill_color = self._glyphs[(piece.color << 3) | piece.piece_type]
+
+            if item is None:
+                x, y = self._square_to_pixel(square)
+                self._piece_items_by_square[square] = self.canvas.create_text(
+                    x,
+                    y,
+                    text=piece_symbol,
+                    font=(self.piece_font_family, self.square_size // 2, "bold"),
+                    tags="piece",
+                    fill=fill_color,
+                )
+            else:
+                self.canvas.itemconfig(item, text=piece_symbol, fill=fill_color)
+
+        self._prev_bitboards = bitboards
+
+    def _layout_pieces(self):
+        """Move existing piece items to their current pixel positions (e.g. after a flip)."""
+        for square, item in self._piece_items_by_square.items():
+            self.canvas.coords(item, *self._square_to_pixel(square))
+
+    def _layout_highlights(self):
+        """Position the destination dots over their squares (on creation and after a flip)."""
+        for square, item in enumerate(self._hl_ovals):
+            x, y = self._square_to_pixel_coords(square)
+            self.canvas.coords(
+                item,
+                x + self.square_size * 0.3,
+                y + self.square_size * 0.3,
+                x + self.square_size * 0.7,
+                y + self.square_size * 0.7,
             )
 
-    def _draw_coordinates(self, offset: int):
-        p = self._palette()
+    def _draw_coordinates(self):
+        """Set the coordinate label texts for the current orientation (on creation and flip)."""
         for i in range(8):
             rank_label = str(8 - i) if not self.board_flipped else str(i + 1)
-            self.canvas.create_text(
-                offset / 2,
-                i * self.square_size + offset + self.square_size / 2,
-                text=rank_label,
-                font=("TkDefaultFont", 10),
-                fill=p["coord_fg"],
-                tags="coordinate",
-            )
-            self.canvas.create_text(
-                8 * self.square_size + offset + offset / 2,
-                i * self.square_size + offset + self.square_size / 2,
-                text=rank_label,
-                font=("TkDefaultFont", 10),
-                fill=p["coord_fg"],
-                tags="coordinate",
-            )
-
             file_label = chr(ord("a") + i) if not self.board_flipped else chr(ord("h") - i)
-            self.canvas.create_text(
-                i * self.square_size + offset + self.square_size / 2,
-                offset / 2,
-                text=file_label,
-                font=("TkDefaultFont", 10),
-                fill=p["coord_fg"],
-                tags="coordinate",
-            )
-            self.canvas.create_text(
-                i * self.square_size + offset + self.square_size / 2,
-                8 * self.square_size + offset + offset / 2,
-                text=file_label,
-                font=("TkDefaultFont", 10),
-                fill=p["coord_fg"],
-                tags="coordinate",
-            )
+            left, right, top, bottom = self._coord_items[i * 4 : i * 4 + 4]
+            for item, label in ((left, rank_label), (right, rank_label), (top, file_label), (bottom, file_label)):
+                self.canvas.itemconfig(item, text=label)
 
     # ----------------------------
     # Interaction
@@ -422,18 +507,20 @@ class ChessAnalyzerApp:
         if self.selected_square is not None:
             move = chess.Move(self.selected_square, clicked_square)
 
-            piece = self.board.piece_at(self.selected_square)
-            if piece and piece.piece_type == chess.PAWN:
-                if (self.board.turn == chess.WHITE and chess.square_rank(clicked_square) == 7) or (
-                    self.board.turn == chess.BLACK and chess.square_rank(clicked_square) == 0
-                ):
-                    move.promotion = chess.QUEEN
+            # A pawn can never reach its own back rank, so either back rank means promotion.
+            board = self.board
+            own_pawns = board.pawns & board.occupied_co[board.turn]
+            if (chess.BB_SQUARES[clicked_square] & chess.BB_BACKRANKS) and (
+                chess.BB_SQUARES[self.selected_square] & own_pawns
+            ):
+                move.promotion = chess.QUEEN
 
-            if move in self.board.legal_moves:
-                self.board.push(move)
+            if self.board.is_legal(move):
+                self._push_move(move)
                 self.fen_var.set(self.board.fen())
                 self.selected_square = None
-                self._draw_board()
+                self._draw_pieces()
+                self._update_player_label()
                 self._clear_highlights()
             else:
                 self.selected_square = None
@@ -449,46 +536,75 @@ class ChessAnalyzerApp:
                 self.selected_square = clicked_square
                 self._highlight_legal_moves(clicked_square)
 
+    def _push_move(self, move: chess.Move):
+        """Push a move and XOR the Zobrist hash forward instead of rehashing the whole board."""
+        board = self.board
+
+        # Superset of the squares the move can touch: unchanged squares cancel out in the XOR.
+        mask = chess.BB_SQUARES[move.from_square] | chess.BB_SQUARES[move.to_square]
+        moving = board.piece_type_at(move.from_square)
+        if moving == chess.KING:
+            mask |= chess.BB_RANKS[chess.square_rank(move.from_square)]  # castling rook
+        elif moving == chess.PAWN:
+            ep_victim = chess.square(chess.square_file(move.to_square), chess.square_rank(move.from_square))
+            mask |= chess.BB_SQUARES[ep_victim]
+
+        h = self._board_hash ^ self._zobrist_delta(board, mask)
+        board.push(move)
+        self._board_hash = h ^ self._zobrist_delta(board, mask)
+        self._stop_stale_analysis()
+
+    def _zobrist_delta(self, board: chess.Board, mask: int) -> int:
+        """Zobrist keys of the pieces on ``mask`` plus castling, en passant and turn."""
+        zobrist = self._zobrist
+        h = zobrist.hash_castling(board) ^ zobrist.hash_ep_square(board) ^ zobrist.hash_turn(board)
+        white = board.occupied_co[chess.WHITE]
+        for square in chess.scan_reversed(mask & board.occupied):
+            pivot = 1 if white & chess.BB_SQUARES[square] else 0
+            piece_index = (board.piece_type_at(square) - 1) * 2 + pivot
+            h ^= zobrist.array[64 * piece_index + square]
+        return h
+
     def _highlight_legal_moves(self, square):
         self._clear_highlights()
-        coord_offset = 30
-        p = self._palette()
-        accent = p["accent"]
 
-        x, y = self._square_to_pixel_coords(square, coord_offset)
-        self.canvas.create_rectangle(
-            x, y, x + self.square_size, y + self.square_size, outline=accent, width=3, tags="highlight"
-        )
+        x, y = self._square_to_pixel_coords(square)
+        self.canvas.coords(self._hl_rect, x, y, x + self.square_size, y + self.square_size)
+        self.canvas.itemconfigure(self._hl_rect, state="normal")
 
-        for move in self.board.legal_moves:
-            if move.from_square == square:
-                dest_square = move.to_square
-                x, y = self._square_to_pixel_coords(dest_square, coord_offset)
-                self.canvas.create_oval(
-                    x + self.square_size * 0.3,
-                    y + self.square_size * 0.3,
-                    x + self.square_size * 0.7,
-                    y + self.square_size * 0.7,
-                    fill=accent,
-                    outline="",
-                    tags="highlight",
-                )
+        for move in self.board.generate_legal_moves(from_mask=chess.BB_SQUARES[square]):
+            item = self._hl_ovals[move.to_square]
+            if item not in self.legal_moves_highlight:
+                self.canvas.itemconfigure(item, state="normal")
+                self.legal_moves_highlight.append(item)
+
+        # Pieces created after the highlight items would otherwise cover the dots.
+        self.canvas.tag_raise("highlight")
 
     def _clear_highlights(self):
-        self.canvas.delete("highlight")
+        self.canvas.itemconfigure(self._hl_rect, state="hidden")
+        for item in self.legal_moves_highlight:
+            self.canvas.itemconfigure(item, state="hidden")
         self.legal_moves_highlight = []
 
     def _flip_board(self):
         self.board_flipped = not self.board_flipped
         self.selected_square = None
-        self._draw_board()
+        self._draw_coordinates()
+        self._layout_pieces()
+        self._layout_highlights()
         self._clear_highlights()
 
     def _reset_board_from_fen(self):
         fen = self.fen_var.get()
         try:
             self.board.set_fen(fen)
-            self._draw_board()
+            self._board_hash = chess.polyglot.zobrist_hash(self.board)
+            self._stop_stale_analysis()
+            self.selected_square = None
+            self._clear_highlights()
+            self._draw_pieces()
+            self._update_player_label()
             self._set_status("Board reset from FEN.", "info")
         except ValueError:
             messagebox.showerror("Invalid FEN", "The FEN string is invalid.")
@@ -497,120 +613,230 @@ class ChessAnalyzerApp:
         player_turn = "White" if self.board.turn == chess.WHITE else "Black"
         self.player_label.config(text=player_turn)
 
-    def _square_to_pixel(self, square, offset):
-        x, y_topleft = self._square_to_pixel_coords(square, offset)
-        return x + self.square_size / 2, y_topleft + self.square_size / 2
-
-    def _square_to_pixel_coords(self, square, offset):
-        file = chess.square_file(square)
-        rank = chess.square_rank(square)
+    def _rebuild_pixel_tables(self, offset: int):
+        """Precompute each square's top-left pixel for both orientations (call again on resize)."""
+        sz = self.square_size
+        self._sq_xy = tuple(
+            (chess.square_file(sq) * sz + offset, (7 - chess.square_rank(sq)) * sz + offset) for sq in chess.SQUARES
+        )
+        self._sq_xy_flipped = tuple(
+            (chess.square_file(sq) * sz + offset, chess.square_rank(sq) * sz + offset) for sq in chess.SQUARES
+        )
 
-        x = file * self.square_size + offset
-        if self.board_flipped:
-            y = rank * self.square_size + offset
-        else:
-            y = (7 - rank) * self.square_size + offset
+    def _square_to_pixel(self, square):
+        x, y_topleft = self._square_to_pixel_coords(square)
+        return x + self.square_size / 2, y_topleft + self.square_size / 2
 
-        return x, y
+    def _square_to_pixel_coords(self, square):
+        return self._sq_xy_flipped[square] if self.board_flipped else self._sq_xy[square]
 
     # ----------------------------
     # Engine threading and analysis
     # ----------------------------
     def _start_engine_thread(self):
+        import asyncio
+        import queue
+        import threading
+
+        # Created here so GUI callbacks can schedule work on it before the thread is running.
+        self._loop = asyncio.new_event_loop()
+        self._engine_lock = asyncio.Lock()
+        self.result_queue = queue.Queue()
+        self.master.bind("<<EngineResult>>", self._drain_results)
         self.engine_thread = threading.Thread(target=self._engine_worker_loop, daemon=True)
         self.engine_thread.start()
 
     def _engine_worker_loop(self):
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        loop.run_until_complete(self._async_engine_handler())
-        loop.close()
+        self._loop.run_forever()
+        self._loop.close()
+
+    def _submit(self, coro):
+        """Schedule a coroutine on the engine loop from the GUI thread."""
+        import asyncio
+
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def _post(self, msg_type: str, data: object):
+        """Hand a result from the engine thread to the Tk event loop."""
+        if self._closing:
+            return
+        self.result_queue.put((msg_type, data))
+        self.master.event_generate("<<EngineResult>>", when="tail")
+
+    def _drain_results(self, _event=None):
+        # The GUI thread is the only consumer, so empty() followed by get_nowait() cannot race.
+        while not self.result_queue.empty():
+            msg_type, data = self.result_queue.get_nowait()
+            self._deliver(msg_type, data)
+
+    async def _do_connect(self, sf_path: str):
+        from chess.engine import popen_uci
+
+        async with self._engine_lock:
+            if self.engine:
+                try:
+                    await self.engine.quit()
+                except Exception:
+                    pass
+                self.engine = None
 
-    async def _async_engine_handler(self):
-        while True:
             try:
-                command, data = self.request_queue.get(timeout=0.1)
-            except queue.Empty:
+                _transport, self.engine = await popen_uci(sf_path)
+                await self.engine.ping()
+                await self.engine.configure(self._engine_config())
+                self._post("connect_success", None)
+            except Exception as e:
+                self.engine = None
+                self._post("connect_fail", str(e))
+
+    def _engine_config(self) -> dict:
+        """Hash/Threads settings, clamped to what the connected engine advertises."""
+        config = {}
+        for name, value in (("Hash", self.engine_hash_mb), ("Threads", self.engine_threads)):
+            option = self.engine.options.get(name)
+            if option is None:
                 continue
+            if option.max is not None:
+                value = min(value, option.max)
+            if option.min is not None:
+                value = max(value, option.min)
+            config[name] = value
+        return config
+
+    async def _do_analyze(self, board_to_analyze: chess.Board, time_limit: float, key: int):
+        from chess.engine import Limit
+
+        if self._analysis is not None:
+            # Superseded: the stopped search finishes quietly without reporting a final result.
+            self._analysis.stop()
+            self._analysis = None
+
+        async with self._engine_lock:
+            if not self.engine:
+                self._post("error", "Engine is not connected.")
+                return
 
-            if command == "connect":
-                sf_path = data
-                if self.engine:
-                    try:
-                        await self.engine.quit()
-                    except Exception:
-                        pass
-                    self.engine = None
+            try:
+                limit = Limit(time=time_limit)
+                with await self.engine.analysis(board_to_analyze, limit) as analysis:
+                    self._analysis = analysis
+                    async for info in analysis:
+                        if self._analysis is analysis and "score" in info and "pv" in info:
+                            self._post("analysis_update", self._analysis_result(info, board_to_analyze.turn, key))
+                    final_info = analysis.info
+                if self._analysis is analysis:
+                    result = self._analysis_result(final_info, board_to_analyze.turn, key)
+                    if final_info.get("score") is not None:
+                        self._store_analysis(key, result, final_info.get("depth", 0))
+                    self._post("analysis_result", result)
+            except Exception as e:
+                self._post("error", f"Analysis failed: {e}")
+            finally:
+                self._analysis = None
+
+    def _store_analysis(self, key: int, result: dict, depth: int):
+        cached = self._tt.get(key)
+        if cached is None or depth >= cached[3]:
+            self._tt[key] = (result["move"], result["eval_text"], result["eval_fg"], depth)
+
+    @classmethod
+    def _analysis_result(cls, info: dict, turn: chess.Color, key: int) -> dict:
+        """Build a display-ready result on the engine thread; the GUI only copies it into labels."""
+        pv = info.get("pv") or []
+        eval_text, eval_fg = cls._format_evaluation(info.get("score"), turn)
+        return {
+            "move": pv[0].uci() if pv else "N/A",
+            "eval_text": eval_text,
+            "eval_fg": eval_fg,
+            "key": key,
+        }
 
-                try:
-                    _transport, self.engine = await chess.engine.popen_uci(sf_path)
-                    await self.engine.ping()
-                    self.result_queue.put(("connect_success", None))
-                except Exception as e:
-                    self.engine = None
-                    self.result_queue.put(("connect_fail", str(e)))
-
-            elif command == "analyze":
-                if not self.engine:
-                    self.result_queue.put(("error", "Engine is not connected."))
-                    continue
-
-                board_to_analyze, time_limit = data
-                try:
-                    info = await self.engine.analyse(board_to_analyze, chess.engine.Limit(time=time_limit))
-                    pv = info.get("pv") or []
-                    analysis_result = {
-                        "move": pv[0].uci() if pv else "N/A",
-                        "score": info.get("score"),
-                        "turn": board_to_analyze.turn,
-                    }
-                    self.result_queue.put(("analysis_result", analysis_result))
-                except Exception as e:
-                    self.result_queue.put(("error", f"Analysis failed: {e}"))
-
-            elif command == "quit":
-                if self.engine:
-                    try:
-                        await self.engine.quit()
-                    except Exception:
-                        pass
-                break
-
-    def _check_result_queue(self):
-        try:
-            msg_type, data = self.result_queue.get_nowait()
-            p = self._palette()
+    @staticmethod
+    def _format_evaluation(score_obj, turn: chess.Color) -> "tuple[str, str]":
+        """Return the evaluation text and the palette key to color it with."""
+        if score_obj is None:
+            return "(Not available)", "muted"
 
-            if msg_type == "connect_success":
-                self.sf_status_label.config(text="Status: Connected!", fg=p["success"])
-                self.analyze_button.config(state=tk.NORMAL)
-                self._set_status("Stockfish connected. Ready to analyze.", "success")
+        pov_score = score_obj.pov(turn)
 
-            elif msg_type == "connect_fail":
-                self.sf_status_label.config(text="Status: Connection failed", fg=p["error"])
-                self.analyze_button.config(state=tk.DISABLED)
-                self._set_status("Connection failed.", "error")
-                messagebox.showerror("Connection Error", f"Could not connect to Stockfish:\n{data}")
+        if pov_score.is_mate():
+            mate_moves = pov_score.mate()
+            if mate_moves is None:
+                return "Mate", "text"
+            elif mate_moves > 0:
+                return f"Mate in {mate_moves}", "success"
+            else:
+                return f"Mated in {-mate_moves}", "error"
+
+        cp_score = pov_score.score(mate_score=10000)
+        if cp_score is None:
+            return "0.00", "text"
+        eval_str = f"{cp_score / 100:.2f}"
+        if cp_score > 50:
+            return eval_str, "success"
+        elif cp_score < -50:
+            return eval_str, "error"
+        else:
+            return eval_str, "text"
 
-            elif msg_type == "analysis_result":
-                self._update_gui_with_analysis(data)
-                self._set_status("Analysis complete.", "success")
-                self.analyze_button.config(state=tk.NORMAL)
+    async def _do_stop_analysis(self):
+        if self._analysis is not None:
+            self._analysis.stop()
+            self._analysis = None
+
+    async def _do_quit(self):
+        if self._analysis is not None:
+            self._analysis.stop()
+            self._analysis = None
 
-            elif msg_type == "error":
-                messagebox.showerror("Error", data)
-                self._set_status(f"Error: {data}", "error")
-                self.analyze_button.config(state=tk.NORMAL)
+        async with self._engine_lock:
+            if self.engine:
+                try:
+                    await self.engine.quit()
+                except Exception:
+                    pass
+                self.engine = None
+        self._loop.stop()
+
+    def _deliver(self, msg_type: str, data: object):
+        p = self._p
+
+        if msg_type == "connect_success":
+            self.sf_status_label.config(text="Status: Connected!", fg=p["success"])
+            self.analyze_button.config(state=tk.NORMAL)
+            self._set_status("Stockfish connected. Ready to analyze.", "success")
+
+        elif msg_type == "connect_fail":
+            self.sf_status_label.config(text="Status: Connection failed", fg=p["error"])
+            self.analyze_button.config(state=tk.DISABLED)
+            self._set_status("Connection failed.", "error")
+            messagebox.showerror("Connection Error", f"Could not connect to Stockfish:\n{data}")
+
+        elif msg_type == "analysis_update":
+            # Updates queued before a board change belong to a position that is gone.
+            if data["key"] == self._analysis_key:
+                self._update_gui_with_analysis(data)
 
-        except queue.Empty:
-            pass
+        elif msg_type == "analysis_result":
+            if data["key"] != self._analysis_key:
+                return
+            self._analysis_key = None
+            self._update_gui_with_analysis(data)
+            self._set_status("Analysis complete.", "success")
+            self.analyze_button.config(state=tk.NORMAL)
 
-        self.master.after(100, self._check_result_queue)
+        elif msg_type == "error":
+            self._analysis_key = None
+            messagebox.showerror("Error", data)
+            self._set_status(f"Error: {data}", "error")
+            self.analyze_button.config(state=tk.NORMAL)
 
     # ----------------------------
     # Stockfish plumbing
     # ----------------------------
     def _browse_stockfish(self):
+        from tkinter import filedialog
+
         if sys.platform.startswith("win"):
             filetypes = [("Executable files", "*.exe"), ("All files", "*.*")]
         else:
@@ -633,66 +859,72 @@ class ChessAnalyzerApp:
             )
             return
 
-        self.request_queue.put(("connect", resolved))
+        if self.engine_thread is None:
+            self._start_engine_thread()
+        self._submit(self._do_connect(resolved))
         self._set_status("Attempting to connect to Stockfish...", "warning")
 
     def _start_analysis(self):
+        key = self._board_hash
+        cached = self._tt.get(key)
+        if cached is not None and cached[3] >= self.tt_min_depth:
+            move_uci, eval_text, eval_fg, _depth = cached
+            self._analysis_key = key
+            self._deliver("analysis_result", {"move": move_uci, "eval_text": eval_text, "eval_fg": eval_fg, "key": key})
+            return
+
         self._set_status("Analyzing position...", "warning")
         self.analyze_button.config(state=tk.DISABLED)
         self.best_move_label.config(text="...")
         self.evaluation_label.config(text="...")
 
-        self.request_queue.put(("analyze", (self.board.copy(), 2.0)))
-
-    def _update_gui_with_analysis(self, result: dict):
-        p = self._palette()
-        best_move_uci = result.get("move")
-        score_obj = result.get("score")
-        analyzed_turn = result.get("turn", self.board.turn)
+        self._analysis_key = key
+        self._submit(self._do_analyze(self.board.copy(), 2.0, key))
 
-        self.best_move_label.config(text=best_move_uci or "N/A", fg=p["text"])
-
-        if score_obj is None:
-            self.evaluation_label.config(text="(Not available)", fg=p["muted"])
+    def _stop_stale_analysis(self):
+        """Stop a running search once the board no longer shows the position it is analyzing."""
+        if self._analysis_key is None:
             return
+        self._analysis_key = None
+        self._submit(self._do_stop_analysis())
 
-        pov_score = score_obj.pov(analyzed_turn)
+        self.best_move_label.config(text="")
+        self.evaluation_label.config(text="")
+        self.analyze_button.config(state=tk.NORMAL)
+        self._set_status("Position changed; analysis stopped.", "info")
 
-        if pov_score.is_mate():
-            mate_moves = pov_score.mate()
-            if mate_moves is None:
-                self.evaluation_label.config(text="Mate", fg=p["text"])
-            elif mate_moves > 0:
-                self.evaluation_label.config(text=f"Mate in {mate_moves}", fg=p["success"])
-            else:
-                self.evaluation_label.config(text=f"Mated in {-mate_moves}", fg=p["error"])
-        else:
-            cp_score = pov_score.score(mate_score=10000)
-            if cp_score is None:
-                self.evaluation_label.config(text="0.00", fg=p["text"])
-                return
-            eval_str = f"{cp_score / 100:.2f}"
-            if cp_score > 50:
-                self.evaluation_label.config(text=eval_str, fg=p["success"])
-            elif cp_score < -50:
-                self.evaluation_label.config(text=eval_str, fg=p["error"])
-            else:
-                self.evaluation_label.config(text=eval_str, fg=p["text"])
+    def _update_gui_with_analysis(self, result: dict):
+        p = self._p
+        self.best_move_label.config(text=result["move"], fg=p["text"])
+        self.evaluation_label.config(text=result["eval_text"], fg=p[result["eval_fg"]])
 
     # ----------------------------
     # Shutdown
     # ----------------------------
     def _on_closing(self):
-        try:
-            self.request_queue.put(("quit", None))
-        except Exception:
-            pass
+        if self._closing:
+            return
+        self._closing = True
 
         if self.engine_thread and self.engine_thread.is_alive():
-            self.engine_thread.join(timeout=2.0)
+            try:
+                self._submit(self._do_quit())
+            except Exception:
+                pass
+            # Don't join() here: event_generate from the worker blocks until the Tk thread handles it,
+            # so the Tk loop has to keep running while the engine shuts down.
+            self._wait_for_engine_thread(40)
+            return
 
         self.master.destroy()
 
+    def _wait_for_engine_thread(self, attempts_left: int):
+        """Poll every 50 ms (about 2 s in total) for the worker to exit, then destroy the window."""
+        if self.engine_thread.is_alive() and attempts_left > 0:
+            self.master.after(50, self._wait_for_engine_thread, attempts_left - 1)
+            return
+        self.master.destroy()
+
 
 if __name__ == "__main__":
     root = tk.Tk()